@@ -2,16 +2,23 @@
 # You can interact with the AI using your voice while the AI can see your screen in real-time.
 
 import asyncio
-import base64
+import collections
 import io
+import itertools
+import math
 import os
 import sys
+import threading
+import time
 import traceback
+import zlib
 from dotenv import load_dotenv
 
-import pyaudio
+import numpy as np
 import PIL.Image
 import mss
+import sounddevice as sd
+from turbojpeg import TurboJPEG, TJPF_BGRX, TJSAMP_420
 
 from google import genai
 from google.genai import types
@@ -21,11 +28,34 @@ if sys.version_info < (3, 11, 0):
     asyncio.TaskGroup = taskgroup.TaskGroup
     asyncio.ExceptionGroup = exceptiongroup.ExceptionGroup
 
-FORMAT = pyaudio.paInt16
+DTYPE = "int16"
 CHANNELS = 1
 SEND_SAMPLE_RATE = 16000
 RECEIVE_SAMPLE_RATE = 24000
 CHUNK_SIZE = 1024
+SAMPLE_WIDTH = 2  # int16
+
+# Mic ring buffer size in CHUNK_SIZE blocks (playback audio is not bounded)
+AUDIO_OUT_BUFFER_CHUNKS = 5
+
+# Client-side silence gate: quiet chunks (int16 RMS below VAD_RMS_THRESHOLD in .env)
+# stop being sent after VAD_HANGOVER_CHUNKS in a row (~0.5s of trailing silence).
+# The last VAD_PREROLL_CHUNKS gated chunks are sent ahead of speech so onsets aren't clipped.
+VAD_HANGOVER_CHUNKS = 8
+VAD_PREROLL_CHUNKS = 2
+# Tell the server the mic stream paused after this long without sending audio
+AUDIO_STREAM_END_SECONDS = 0.5
+
+# Everything sent to the session goes through one writer; lower priority goes first.
+# The queue is kept small so backlog stays in the drop-oldest audio/frame buffers.
+OUTBOUND_QUEUE_SIZE = 2
+AUDIO_PRIORITY = 0
+IMAGE_PRIORITY = 1
+
+# Pillow fallback only: downscale frames by round-tripping through a quick JPEG and
+# letting libjpeg decode it at 1/2, 1/4 or 1/8 size (Image.draft) instead of
+# resampling every pixel. Only helps captures at least twice the 1024px target.
+JPEG_DRAFT_DOWNSCALE = False
 
 # 新しいモデル名に更新
 MODEL = "gemini-2.5-flash-preview-native-audio-dialog"
@@ -33,6 +63,7 @@ MODEL = "gemini-2.5-flash-preview-native-audio-dialog"
 load_dotenv()  # Load variables from .env
 
 api_key = os.getenv('GEMINI_API_KEY')
+vad_rms_threshold = float(os.getenv('VAD_RMS_THRESHOLD', '300'))  # 0で無効
 system_prompt = os.getenv('SYSTEM_PROMPT', 'You are a professional and detailed AI assistant. Please provide as thorough an answer as possible to the user\'s questions.')
 
 client = genai.Client(
@@ -46,13 +77,148 @@ CONFIG = types.LiveConnectConfig(
     system_instruction=system_prompt
 )
 
-pya = pyaudio.PyAudio()
+# libjpeg-turbo encodes the BGRA capture directly; fall back to Pillow if the
+# shared library isn't installed (e.g. `brew install jpeg-turbo` on macOS)
+try:
+    _JPEG_ENCODER = TurboJPEG()
+except (RuntimeError, OSError) as e:
+    print(f"libjpeg-turbo not available, using Pillow for JPEG encoding: {e}")
+    _JPEG_ENCODER = None
+
+
+def _warm_up_jpeg_encoder():
+    """小さな画像を一度エンコードし、最初のフレームでの初期化コストを起動時に済ませる"""
+    if _JPEG_ENCODER is not None:
+        _JPEG_ENCODER.encode(
+            np.zeros((64, 64, 4), dtype=np.uint8), quality=60, pixel_format=TJPF_BGRX, jpeg_subsample=TJSAMP_420
+        )
+    else:
+        PIL.Image.new("RGB", (64, 64)).save(
+            io.BytesIO(), format="jpeg", quality=60, optimize=False, progressive=False, subsampling=2
+        )
+
+
+_warm_up_jpeg_encoder()
+
+class AudioRingBuffer:
+    """PCM音声用のシングルプロデューサ・シングルコンシューマのリングバッファ
+
+    バッファは生成時に確保し、以降は書き込み・読み出しごとの割り当てを行わない。
+    ロックはインデックス更新とコピーの間だけ保持し、awaitをまたいで保持しない。
+    イベントループ上で生成すること。
+    """
+
+    def __init__(self, capacity):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._capacity = capacity
+        self._read_pos = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._readable = asyncio.Event()
+
+    def _notify(self, event):
+        if threading.get_ident() == self._loop_thread:
+            event.set()
+        else:
+            self._loop.call_soon_threadsafe(event.set)
+
+    def _write(self, data):
+        # Caller holds the lock. Overwrites the oldest bytes when full.
+        n = len(data)
+        if n >= self._capacity:
+            data = data[n - self._capacity:]
+            n = self._capacity
+            self._read_pos = 0
+            self._size = 0
+        overflow = self._size + n - self._capacity
+        if overflow > 0:
+            self._read_pos = (self._read_pos + overflow) % self._capacity
+            self._size -= overflow
+        write_pos = (self._read_pos + self._size) % self._capacity
+        first = min(n, self._capacity - write_pos)
+        self._view[write_pos:write_pos + first] = data[:first]
+        self._view[:n - first] = data[first:]
+        self._size += n
+
+    def _read(self, max_bytes):
+        # Caller holds the lock.
+        n = self._size if max_bytes is None else min(self._size, max_bytes)
+        end = self._read_pos + n
+        if end <= self._capacity:
+            data = bytes(self._view[self._read_pos:end])
+        else:
+            data = bytes(self._view[self._read_pos:]) + bytes(self._view[:end - self._capacity])
+        self._read_pos = end % self._capacity
+        self._size -= n
+        return data
+
+    def put_nowait(self, data):
+        """書き込む。空きが足りなければ最も古いデータを上書きする"""
+        with self._lock:
+            self._write(memoryview(data).cast("B"))
+        self._notify(self._readable)
+
+    async def get(self, max_bytes=None):
+        """データが届くまで待ち、最大max_bytesバイトを読み出す"""
+        while True:
+            await self._readable.wait()
+            with self._lock:
+                if self._size:
+                    data = self._read(max_bytes)
+                    if not self._size:
+                        self._readable.clear()
+                    break
+                self._readable.clear()
+        return data
+
+
+class PlaybackBuffer:
+    """再生待ちの音声バッファ
+
+    受信したチャンクを上限なく溜め、出力コールバックが必要なバイト数ずつ取り出す。
+    書き込みは待たないので、受信タスクが再生速度に縛られることはない。
+    """
+
+    def __init__(self):
+        self._chunks = collections.deque()
+        self._offset = 0  # 先頭チャンクのうち読み出し済みのバイト数
+        self._lock = threading.Lock()
+
+    def put_nowait(self, data):
+        with self._lock:
+            self._chunks.append(data)
+
+    def get_nowait(self, max_bytes):
+        """最大max_bytesバイトを読み出す。足りなければあるだけ返す"""
+        data = bytearray()
+        with self._lock:
+            while self._chunks and len(data) < max_bytes:
+                chunk = self._chunks[0]
+                n = min(len(chunk) - self._offset, max_bytes - len(data))
+                data += memoryview(chunk)[self._offset:self._offset + n]
+                self._offset += n
+                if self._offset == len(chunk):
+                    self._chunks.popleft()
+                    self._offset = 0
+        return data
+
+    def clear(self):
+        """まだ再生していない音声を全て捨てる"""
+        with self._lock:
+            self._chunks.clear()
+            self._offset = 0
+
 
 class AudioLoop:
     def __init__(self):
         self.audio_in_queue = None
         self.audio_out_queue = None
         self.data_out_queue = None
+        self.outbound_queue = None
+        self._outbound_seq = itertools.count()  # 同じ優先度内の順序を保つ
 
         self.session = None
 
@@ -65,6 +231,11 @@ class AudioLoop:
         
         self.is_running = True
 
+        self._last_frame_digest = None
+        self._frame_array = None
+        self._quiet_chunks = 0
+        self._preroll = collections.deque(maxlen=VAD_PREROLL_CHUNKS)  # 送らなかった直近の無音チャンク
+
     async def initialize_session(self):
         """Live API用のセッションを初期化する"""
         try:
@@ -84,13 +255,31 @@ class AudioLoop:
             except Exception as e:
                 print(f"Error closing Live API session: {e}")
 
+    def _read_input(self, loop, text_queue):
+        """専用スレッドで端末入力を読み、イベントループ側のキューに渡す"""
+        while self.is_running:
+            try:
+                text = input("message > ")
+            except EOFError:
+                print("\nInput stream ended. Retrying in 1 second...")
+                time.sleep(1)
+                continue
+            try:
+                loop.call_soon_threadsafe(text_queue.put_nowait, text)
+            except RuntimeError:  # イベントループ終了後
+                break
+            if text.lower() == "q":
+                break
+
     async def send_text(self):
+        # 入力待ちでスレッドプールを占有しないよう、input()は専用のデーモンスレッドで呼ぶ
+        text_queue = asyncio.Queue()
+        threading.Thread(
+            target=self._read_input, args=(asyncio.get_running_loop(), text_queue), name="stdin", daemon=True
+        ).start()
         while self.is_running:
             try:
-                text = await asyncio.to_thread(
-                    input,
-                    "message > ",
-                )
+                text = await text_queue.get()
                 if text.lower() == "q":
                     self.is_running = False
                     break
@@ -99,117 +288,188 @@ class AudioLoop:
                     turns={"role": "user", "parts": [{"text": text or "."}]}, 
                     turn_complete=True
                 )
-            except EOFError:
-                print("\nInput stream ended. Retrying in 1 second...")
-                await asyncio.sleep(1)
-                continue
             except Exception as e:
                 print(f"\nError in send_text: {e}")
                 await asyncio.sleep(1)
                 continue
 
-    def _get_frame(self, sct):
+    def _draft_downscale(self, img, draft_buf):
+        """JPEGに一度エンコードし、libjpegのDCT領域で縮小デコードする"""
+        # thumbnail後のサイズを下回らない範囲で、libjpegが選べる最大の縮小率（1/2〜1/8）を使う
+        ratio = 1024 / max(img.size)
+        target = (math.ceil(img.width * ratio), math.ceil(img.height * ratio))
+        if min(img.width // target[0], img.height // target[1]) < 2:
+            return img  # 1/2にも縮められないなら往復エンコードは無駄
+
+        draft_buf.seek(0)
+        draft_buf.truncate()
+        img.save(draft_buf, format="jpeg", quality=75, optimize=False)
+        draft_buf.seek(0)
+        draft = PIL.Image.open(draft_buf)
+        draft.draft("RGB", target)
+        draft.load()
+        return draft
+
+    def _encode_turbojpeg(self, sct_img):
+        """libjpeg-turboでBGRAのキャプチャをRGBに変換せず直接JPEGにエンコードする"""
+        arr = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+        # 長辺が1024px以下になる整数ステップで間引く（PILのリサンプリングより大幅に安い）
+        step = max(1, math.ceil(max(arr.shape[:2]) / 1024))
+        small = arr[::step, ::step]
+        # 縮小結果の連続バッファは解像度が変わらない限り使い回す
+        if self._frame_array is None or self._frame_array.shape != small.shape:
+            self._frame_array = np.empty(small.shape, dtype=np.uint8)
+        np.copyto(self._frame_array, small)
+        return _JPEG_ENCODER.encode(self._frame_array, quality=60, pixel_format=TJPF_BGRX, jpeg_subsample=TJSAMP_420)
+
+    def _encode_pil(self, sct_img, buf, draft_buf):
+        """Pillowで縮小・JPEGエンコードする（libjpeg-turboがない環境用）"""
+        # sct_img.raw is the BGRA bytearray itself; sct_img.bgra would copy it again
+        img = PIL.Image.frombuffer("RGB", sct_img.size, sct_img.raw, "raw", "BGRX", 0, 1)
+        if JPEG_DRAFT_DOWNSCALE:
+            img = self._draft_downscale(img, draft_buf)
+        img.thumbnail([1024, 1024], PIL.Image.Resampling.HAMMING)
+
+        buf.seek(0)
+        buf.truncate()
+        # 使い捨てのフレームなのでHuffman最適化は行わず、品質60・4:2:0で高速にエンコード
+        img.save(buf, format="jpeg", quality=60, optimize=False, progressive=False, subsampling=2)
+        return buf.getvalue()
+
+    def _get_frame(self, sct, monitor, buf, draft_buf):
         try:
-            monitor = sct.monitors[1]  # Use the primary monitor
             sct_img = sct.grab(monitor)
-            img = PIL.Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-            img.thumbnail([1024, 1024])
+            # 画面に変化がなければエンコードも送信もしない
+            digest = zlib.crc32(sct_img.raw)
+            if digest == self._last_frame_digest:
+                return None
 
-            image_io = io.BytesIO()
-            img.save(image_io, format="jpeg")
-            image_io.seek(0)
+            if _JPEG_ENCODER is not None:
+                image_bytes = self._encode_turbojpeg(sct_img)
+            else:
+                image_bytes = self._encode_pil(sct_img, buf, draft_buf)
+            # エンコードに成功したフレームだけを「送信済み」として覚える
+            self._last_frame_digest = digest
 
             mime_type = "image/jpeg"
-            image_bytes = image_io.read()
-            return {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode()}
+            return {"mime_type": mime_type, "data": image_bytes}
         except Exception as e:
             print(f"Error in _get_frame: {e}")
             return None
 
-    async def get_frames(self):
+    def _put_frame(self, frame_data):
+        """送信待ちが一杯なら最も古いフレームを捨て、最新のフレームを入れる"""
+        try:
+            self.data_out_queue.put_nowait(frame_data)
+        except asyncio.QueueFull:
+            self.data_out_queue.get_nowait()
+            self.data_out_queue.put_nowait(frame_data)
+
+    def _capture_frames(self, loop):
+        """キャプチャ・エンコード・キュー投入を1つのワーカースレッド内で繰り返す"""
         with mss.mss() as sct:
+            # ループ中に変わらないものは最初に一度だけ用意する
+            monitor = sct.monitors[1]  # Use the primary monitor
+            buf = io.BytesIO()
+            draft_buf = io.BytesIO()
             while self.is_running:
                 try:
-                    frame_data = await asyncio.to_thread(self._get_frame, sct)
-                    if frame_data is None:
-                        await asyncio.sleep(1)
-                        continue
-
-                    await asyncio.sleep(2.0)  # キャプチャ間隔2秒
-                    await self.data_out_queue.put(frame_data)
+                    frame_data = self._get_frame(sct, monitor, buf, draft_buf)
+                    if frame_data is not None:  # Noneは画面に変化なし、または取得失敗
+                        loop.call_soon_threadsafe(self._put_frame, frame_data)
+                    time.sleep(2.0)  # キャプチャ間隔2秒
                 except Exception as e:
                     print(f"Error in get_frames: {e}")
-                    await asyncio.sleep(2)  # エラー時の待機時間2秒
+                    time.sleep(2)  # エラー時の待機時間2秒
 
-    async def send_realtime(self):
-        async def process_audio_queue():
-            retry_count = 0
-            max_retries = 3
-            while self.is_running:
-                try:
-                    audio_msg = await self.audio_out_queue.get()
-                    # 新しいAPIに合わせて音声送信方法を更新
-                    await self.session.send_realtime_input(
-                        audio=types.Blob(data=audio_msg["data"], mime_type="audio/pcm;rate=16000")
-                    )
-                    retry_count = 0  # 成功したらリトライカウントをリセット
-                except Exception as e:
-                    print(f"Error in process_audio_queue: {e}")
-                    retry_count += 1
-                    if retry_count >= max_retries:
-                        print("Maximum retries exceeded in process_audio_queue, waiting longer...")
-                        await asyncio.sleep(5)  # 待機時間5秒
-                        retry_count = 0
-                    else:
-                        await asyncio.sleep(1)
-
-        async def process_data_queue():
-            retry_count = 0
-            max_retries = 3
-            while self.is_running:
-                try:
-                    data_msg = await self.data_out_queue.get()
-                    # 新しいAPIに合わせて画像送信方法を更新
-                    await self.session.send_client_content(
-                        turns={"role": "user", "parts": [{"inline_data": data_msg}]},
-                        turn_complete=False  # 画像は会話の一部として送信
-                    )
-                    retry_count = 0  # 成功したらリトライカウントをリセット
-                except Exception as e:
-                    print(f"Error in process_data_queue: {e}")
-                    retry_count += 1
-                    if retry_count >= max_retries:
-                        print("Maximum retries exceeded in process_data_queue, waiting longer...")
-                        await asyncio.sleep(5)  # 待機時間5秒
-                        retry_count = 0
-                    else:
-                        await asyncio.sleep(1)
+    async def get_frames(self):
+        await asyncio.to_thread(self._capture_frames, asyncio.get_running_loop())
+
+    async def _enqueue_outbound(self, priority, realtime_input):
+        await self.outbound_queue.put((priority, next(self._outbound_seq), realtime_input))
+
+    async def _send_outbound_loop(self):
+        """送信キューのメッセージを1つずつ送信する唯一のライター（音声を画像より優先）"""
+        retry_count = 0
+        max_retries = 3
+        while self.is_running:
+            priority = None
+            try:
+                priority, _, realtime_input = await self.outbound_queue.get()
+                await self.session.send_realtime_input(**realtime_input)
+                retry_count = 0  # 成功したらリトライカウントをリセット
+            except Exception as e:
+                print(f"Error in _send_outbound_loop: {e}")
+                if priority == IMAGE_PRIORITY:
+                    # 送れなかったフレームは未送信扱いにし、画面が変わらなくても次のキャプチャで送り直す
+                    self._last_frame_digest = None
+                retry_count += 1
+                if retry_count >= max_retries:
+                    print("Maximum retries exceeded in _send_outbound_loop, waiting longer...")
+                    await asyncio.sleep(5)  # 待機時間5秒
+                    retry_count = 0
+                else:
+                    await asyncio.sleep(1)
+
+    async def _send_audio_loop(self):
+        """マイク音声を送信キューに入れる（溜まっている分は1回の送信にまとめる）"""
+        stream_open = False
+        while self.is_running:
+            try:
+                audio_data = await asyncio.wait_for(self.audio_out_queue.get(), AUDIO_STREAM_END_SECONDS)
+            except asyncio.TimeoutError:
+                # 無音で送信が途切れたら、サーバー側の発話検出のために音声の区切りを伝える
+                if stream_open:
+                    await self._enqueue_outbound(AUDIO_PRIORITY, {"audio_stream_end": True})
+                    stream_open = False
+                continue
+            stream_open = True
+            await self._enqueue_outbound(
+                AUDIO_PRIORITY, {"audio": types.Blob(data=audio_data, mime_type="audio/pcm;rate=16000")}
+            )
 
-        await asyncio.gather(process_audio_queue(), process_data_queue())
+    async def _send_images_loop(self):
+        """画面フレームを送信キューに入れる"""
+        while self.is_running:
+            data_msg = await self.data_out_queue.get()
+            # 画像は音声と同様にリアルタイム入力としてバイナリのまま送信
+            await self._enqueue_outbound(
+                IMAGE_PRIORITY, {"video": types.Blob(data=data_msg["data"], mime_type=data_msg["mime_type"])}
+            )
+
+    def _on_audio_input(self, indata, frames, time_info, status):
+        """PortAudioのコールバックスレッドからマイク音声をリングバッファに書き込む"""
+        # 音量が小さいチャンクが続いたら送らない（発話の後ろはVAD_HANGOVER_CHUNKS分だけ残す）
+        samples = np.frombuffer(indata, dtype=np.int16)
+        rms = np.sqrt(np.mean(samples.astype(np.float32) ** 2))
+        if rms < vad_rms_threshold:
+            self._quiet_chunks += 1
+            if self._quiet_chunks > VAD_HANGOVER_CHUNKS:
+                # indataはコールバック後に再利用されるのでコピーして取っておく
+                self._preroll.append(bytes(indata))
+                return
+        else:
+            self._quiet_chunks = 0
+        try:
+            # 発話の立ち上がりが欠けないよう、直前の無音チャンクを先に送る
+            while self._preroll:
+                self.audio_out_queue.put_nowait(self._preroll.popleft())
+            # indataはPortAudioのバッファそのもの。bytesにせずリングバッファへ直接コピーする
+            self.audio_out_queue.put_nowait(indata)
+        except RuntimeError:  # イベントループ終了後
+            raise sd.CallbackStop
 
     async def listen_audio(self):
         try:
-            mic_info = pya.get_default_input_device_info()
             self.audio_stream = await asyncio.to_thread(
-                pya.open,
-                format=FORMAT,
+                sd.RawInputStream,
+                samplerate=SEND_SAMPLE_RATE,
+                blocksize=CHUNK_SIZE,
                 channels=CHANNELS,
-                rate=SEND_SAMPLE_RATE,
-                input=True,
-                input_device_index=mic_info["index"],
-                frames_per_buffer=CHUNK_SIZE,
+                dtype=DTYPE,
+                callback=self._on_audio_input,
             )
-            if __debug__:
-                kwargs = {"exception_on_overflow": False}
-            else:
-                kwargs = {}
-            while self.is_running:
-                try:
-                    data = await asyncio.to_thread(self.audio_stream.read, CHUNK_SIZE, **kwargs)
-                    await self.audio_out_queue.put({"data": data, "mime_type": "audio/pcm"})
-                except Exception as e:
-                    print(f"Error in listen_audio: {e}")
-                    await asyncio.sleep(1)
+            self.audio_stream.start()
         except Exception as e:
             print(f"Error initializing audio stream: {e}")
 
@@ -221,10 +481,15 @@ class AudioLoop:
         while self.is_running:
             try:
                 async for response in self.session.receive():
+                    if response.server_content and response.server_content.interrupted:
+                        # ユーザーが割り込んだときだけ、まだ再生していない音声を捨てる
+                        self.audio_in_queue.clear()
+                        continue
                     if response.audio is not None:
                         # 音声レスポンスの処理
                         audio_data = response.audio.data
-                        await self.audio_in_queue.put(audio_data)
+                        # 再生を待たずに積むだけなので、割り込み等の制御メッセージをすぐ読める
+                        self.audio_in_queue.put_nowait(audio_data)
                     elif response.text is not None:
                         # テキストレスポンスの処理（デバッグ用）
                         print(response.text, end="")
@@ -245,22 +510,25 @@ class AudioLoop:
                 else:
                     await asyncio.sleep(1)
 
+    def _on_audio_output(self, outdata, frames, time_info, status):
+        """PortAudioのコールバックスレッドから再生待ちの音声を再生する"""
+        size = len(outdata)
+        data = self.audio_in_queue.get_nowait(size)
+        outdata[:len(data)] = data
+        if len(data) < size:
+            outdata[len(data):] = b"\x00" * (size - len(data))  # 足りない分は無音で埋める
+
     async def play_audio(self):
         try:
             self.play_stream = await asyncio.to_thread(
-                pya.open,
-                format=FORMAT,
+                sd.RawOutputStream,
+                samplerate=RECEIVE_SAMPLE_RATE,
+                blocksize=CHUNK_SIZE,
                 channels=CHANNELS,
-                rate=RECEIVE_SAMPLE_RATE,
-                output=True,
+                dtype=DTYPE,
+                callback=self._on_audio_output,
             )
-            while self.is_running:
-                try:
-                    bytestream = await self.audio_in_queue.get()
-                    await asyncio.to_thread(self.play_stream.write, bytestream)
-                except Exception as e:
-                    print(f"Error in play_audio: {e}")
-                    sys.exit(0)
+            self.play_stream.start()
         except Exception as e:
             print(f"Error initializing play stream: {e}")
 
@@ -272,14 +540,18 @@ class AudioLoop:
                 print("Failed to initialize Live API session. Exiting.")
                 return
 
-            self.audio_in_queue = asyncio.Queue()
-            self.audio_out_queue = asyncio.Queue(maxsize=5)
+            self.audio_in_queue = PlaybackBuffer()
+            self.audio_out_queue = AudioRingBuffer(CHUNK_SIZE * SAMPLE_WIDTH * AUDIO_OUT_BUFFER_CHUNKS)
             self.data_out_queue = asyncio.Queue(maxsize=5)
+            self.outbound_queue = asyncio.PriorityQueue(maxsize=OUTBOUND_QUEUE_SIZE)
 
             # タスクグループの更新
             async with asyncio.TaskGroup() as tg:
                 send_text_task = tg.create_task(self.send_text())
-                tg.create_task(self.send_realtime())
+                # 音声と画像は別タスクで送信キューに入れ、送信は1つのライタータスクで行う
+                tg.create_task(self._send_outbound_loop())
+                tg.create_task(self._send_audio_loop())
+                tg.create_task(self._send_images_loop())
                 tg.create_task(self.listen_audio())
                 tg.create_task(self.get_frames())
                 tg.create_task(self.receive_responses())  # 新しいレスポンス受信タスク
@@ -298,14 +570,12 @@ class AudioLoop:
             await self.close_session()
             # Stop and close the audio stream if it exists
             if self.audio_stream:
-                self.audio_stream.stop_stream()
+                self.audio_stream.stop()
                 self.audio_stream.close()
             # Stop and close the play stream if it exists
             if self.play_stream:
-                self.play_stream.stop_stream()
+                self.play_stream.stop()
                 self.play_stream.close()
-            # Terminate PyAudio object
-            pya.terminate()
 
 if __name__ == "__main__":
     main = AudioLoop()